@@ -30,17 +30,15 @@ from __future__ import annotations
 
 import re
 import os
-import json
-import shutil
-from datetime import datetime
-from typing import Iterable, List, Sequence, Optional, Dict
+import weakref
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Sequence, Optional, Dict, Tuple
 
 
 
 
 from anki.collection import Collection
 from aqt import gui_hooks, mw
-from aqt.browser import Browser
 from aqt.qt import (
     QAction,
     QDialog,
@@ -53,10 +51,19 @@ from aqt.qt import (
     QMenu,
     QLineEdit,
     QTimer,
+    QWidget,
     QCheckBox,
+    QObject,
+    QEvent,
+    sip,
 )
 from aqt.utils import showInfo, tooltip, askUser
 
+if TYPE_CHECKING:
+    # Só para anotações: o módulo aqt.browser não é carregado pelo add-on
+    # na inicialização (ver _sidebar_search_bar_class).
+    from aqt.browser import Browser
+
 # =========================================================
 # Config helpers (arquivo JSON próprio na pasta do add-on)
 # =========================================================
@@ -80,6 +87,8 @@ BACKUP_DIRNAME = "uworld_ids_backups"
 CONFIG_FILENAME = "uworld_ids_config.json"
 # Pasta onde serão guardados os backups do JSON
 BACKUP_DIRNAME = "uworld_ids_backups"
+# Quantidade máxima de backups mantidos
+MAX_BACKUPS = 10
 
 
 
@@ -96,8 +105,20 @@ def _backup_config_file_if_exists() -> None:
     """
     Se o arquivo de config atual existir, faz uma cópia dele
     para a pasta de backups, com timestamp no nome.
-    Mantém no máximo 10 backups, apagando os mais antigos.
+    Mantém no máximo MAX_BACKUPS backups, apagando os mais antigos.
     """
+    # imports locais: só são necessários quando algo é salvo
+    import shutil
+    from collections import deque
+    from datetime import datetime
+
+    def _remove_backup(fname: str) -> None:
+        try:
+            os.remove(os.path.join(backup_dir, fname))
+            print(f"[UWorld IDs] Backup antigo removido: {fname}")
+        except Exception as e:
+            print(f"[UWorld IDs] Erro ao remover backup antigo {fname}: {e}")
+
     try:
         cfg_path = _config_path()
         if not os.path.exists(cfg_path):
@@ -112,6 +133,24 @@ def _backup_config_file_if_exists() -> None:
         backup_dir = os.path.join(folder, BACKUP_DIRNAME)
         os.makedirs(backup_dir, exist_ok=True)
 
+        # Nomes dos backups existentes (mais novo primeiro), mantidos em memória.
+        # A pasta só é listada na primeira gravação da sessão.
+        backups = _CFG_CACHE["backup_names"]
+        if backups is None:
+            existing = sorted(
+                (
+                    fname
+                    for fname in os.listdir(backup_dir)
+                    if fname.startswith("uworld_ids_config_") and fname.endswith(".json")
+                ),
+                # como o nome começa com YYYY-MM-DD..., ordenar por nome já é cronológico
+                reverse=True,
+            )
+            for fname in existing[MAX_BACKUPS:]:
+                _remove_backup(fname)
+            backups = deque(existing[:MAX_BACKUPS], maxlen=MAX_BACKUPS)
+            _CFG_CACHE["backup_names"] = backups
+
         # cria backup novo
         ts = datetime.now().strftime("%Y-%m-%d-%H%M%S")
         backup_name = f"uworld_ids_config_{ts}.json"
@@ -120,25 +159,12 @@ def _backup_config_file_if_exists() -> None:
         shutil.copy2(cfg_path, backup_path)
         print(f"[UWorld IDs] Backup de config criado em: {backup_path}")
 
-        # ---------- rotação: manter no máximo 10 ----------
-        # lista todos os backups que seguem o padrão
-        all_backups = []
-        for fname in os.listdir(backup_dir):
-            if fname.startswith("uworld_ids_config_") and fname.endswith(".json"):
-                all_backups.append(fname)
-
-        if len(all_backups) > 10:
-            # como o nome começa com YYYY-MM-DD..., ordenar por nome já é cronológico
-            all_backups.sort()
-            # quantos precisam ser removidos
-            excess = len(all_backups) - 10
-            to_remove = all_backups[:excess]
-            for fname in to_remove:
-                try:
-                    os.remove(os.path.join(backup_dir, fname))
-                    print(f"[UWorld IDs] Backup antigo removido: {fname}")
-                except Exception as e:
-                    print(f"[UWorld IDs] Erro ao remover backup antigo {fname}: {e}")
+        # ---------- rotação: manter no máximo MAX_BACKUPS ----------
+        # (mesmo segundo = mesmo nome: o arquivo foi só sobrescrito)
+        if backup_name not in backups:
+            if len(backups) == MAX_BACKUPS:
+                _remove_backup(backups.pop())
+            backups.appendleft(backup_name)
 
     except Exception as e:
         # backup não é crítico, então só loga erro
@@ -147,64 +173,137 @@ def _backup_config_file_if_exists() -> None:
 
 
 
-def _normalize_ids_list(raw) -> List[str]:
-    """Normaliza lista de IDs: tudo string numérica, única, ordenada."""
+def _parse_ids(raw) -> Iterator[int]:
+    """Converte itens (int ou string numérica) em int, ignorando inválidos."""
+    for item in raw:
+        if isinstance(item, int) and not isinstance(item, bool):
+            yield item
+            continue
+        s = str(item).strip()
+        if s.isdecimal():
+            yield int(s)
+
+
+def _normalize_ids_list(raw) -> List[int]:
+    """Normaliza lista de IDs: tudo int, único, ordenado."""
     if not raw:
         return []
+    return sorted(set(_parse_ids(raw)))
+
+
+# Cache em memória do JSON lido do disco.
+# "mtime" é o do arquivo na hora da leitura (None se não existia);
+# "cfg" = None significa que precisa reler.
+# Os IDs respondidos são normalizados uma única vez, na leitura, e guardados
+# como int (no JSON também): "answered_set" para testes de pertinência,
+# "answered_sorted" para exibição. Configs antigas com strings continuam válidas.
+# "sha" é o hash do conteúdo do arquivo lido, para pular gravações idênticas.
+# "backup_names" é a fila (deque) dos backups existentes; None até o 1º backup.
+_CFG_CACHE = {
+    "mtime": None,
+    "cfg": None,
+    "sha": None,
+    "answered_set": frozenset(),
+    "answered_sorted": (),
+    "backup_names": None,
+}
+
+
+def _refresh_config_cache() -> None:
+    """Relê o JSON do disco só se o mtime mudou (ou o cache foi invalidado)."""
+    path = _config_path()
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
 
-    ids: List[str] = []
+    if _CFG_CACHE["cfg"] is not None and _CFG_CACHE["mtime"] == mtime:
+        return
 
-    # Se for set, converte para lista
-    if isinstance(raw, set):
-        raw = list(raw)
+    cfg = {}
+    sha = None
+    if mtime is not None:
+        import hashlib
+        import json
 
-    for item in raw:
-        s = str(item).strip()
-        if s.isdigit():
-            ids.append(s)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            sha = hashlib.sha1(text.encode("utf-8")).digest()
+            cfg = json.loads(text)
+        except Exception as e:
+            print(f"[UWorld IDs] Erro ao ler config: {e}")
+            cfg = {}
+
+    raw_ids = cfg.get("answered_ids") or []
+    answered_set = frozenset(_parse_ids(raw_ids))
 
-    unique_ids = list(set(ids))
-    return sorted(unique_ids, key=int)
+    _CFG_CACHE["mtime"] = mtime
+    _CFG_CACHE["cfg"] = cfg
+    _CFG_CACHE["sha"] = sha
+    _CFG_CACHE["answered_set"] = answered_set
+    _CFG_CACHE["answered_sorted"] = tuple(sorted(answered_set))
 
 
 def _load_raw_config() -> dict:
-    """Lê o JSON cru do disco (ou retorna {} se não existir)."""
-    path = _config_path()
-    if not os.path.exists(path):
-        return {}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"[UWorld IDs] Erro ao ler config: {e}")
-        return {}
-    
+    """Lê o JSON cru (cópia do cache; {} se o arquivo não existir)."""
+    _refresh_config_cache()
+    return dict(_CFG_CACHE["cfg"])
+
+
+def _answered_set() -> frozenset:
+    """Set (cacheado) dos IDs já respondidos, para testes de pertinência."""
+    _refresh_config_cache()
+    return _CFG_CACHE["answered_set"]
+
 
 
 def _save_raw_config(cfg: dict) -> None:
-    """Grava o JSON cru no disco, com backup da versão anterior."""
+    """
+    Grava o JSON cru no disco, com backup da versão anterior.
+    Se o conteúdo for idêntico ao do arquivo atual, não faz nada.
+    A gravação passa por um arquivo temporário + os.replace (atômico).
+    """
+    import hashlib
+    import json
+
     path = _config_path()
+    tmp_path = path + ".tmp"
     try:
+        payload = json.dumps(cfg, ensure_ascii=False, indent=2)
+
+        # garante que o hash em cache corresponde ao arquivo atual
+        _refresh_config_cache()
+        if hashlib.sha1(payload.encode("utf-8")).digest() == _CFG_CACHE["sha"]:
+            return
+
         # antes de sobrescrever, guarda uma cópia da versão atual (se existir)
         _backup_config_file_if_exists()
 
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(cfg, f, ensure_ascii=False, indent=2)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
     except Exception as e:
         print(f"[UWorld IDs] Erro ao salvar config: {e}")
+        # não deixa o temporário de uma gravação que falhou para trás
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    # força releitura na próxima consulta: o arquivo pode ter mudado
+    # (gravação feita) ou estar num estado incerto (gravação falhou).
+    # Gravações puladas por conteúdo idêntico retornam antes daqui.
+    _CFG_CACHE["cfg"] = None
 
 
 
 def get_config() -> dict:
     """Obtém configuração normalizada."""
-    cfg = _load_raw_config() or {}
+    cfg = _load_raw_config()
 
-    if "answered_ids" not in cfg:
-        cfg["answered_ids"] = []
-    if "filter_used" not in cfg:
-        cfg["filter_used"] = True
-
-    cfg["answered_ids"] = _normalize_ids_list(cfg.get("answered_ids", []))
+    # IDs já normalizados na leitura (ver _refresh_config_cache)
+    cfg["answered_ids"] = list(_CFG_CACHE["answered_sorted"])
     cfg["filter_used"] = bool(cfg.get("filter_used", True))
 
     return cfg
@@ -217,13 +316,13 @@ def save_config(cfg: dict) -> None:
     _save_raw_config(cfg)
 
 
-def get_answered_ids() -> List[str]:
-    """Lista de IDs já respondidos (strings numéricas)."""
-    cfg = get_config()
-    return _normalize_ids_list(cfg.get("answered_ids", []))
+def get_answered_ids() -> Tuple[int, ...]:
+    """IDs já respondidos (ints, ordenados), direto do cache."""
+    _refresh_config_cache()
+    return _CFG_CACHE["answered_sorted"]
 
 
-def set_answered_ids(ids: Iterable[str]) -> None:
+def set_answered_ids(ids: Iterable[int]) -> None:
     """Define lista de IDs já respondidos."""
     cfg = get_config()
     cfg["answered_ids"] = _normalize_ids_list(ids)
@@ -232,8 +331,8 @@ def set_answered_ids(ids: Iterable[str]) -> None:
 
 def get_filter_used() -> bool:
     """Se True, filtra IDs já respondidos na extração."""
-    cfg = get_config()
-    return bool(cfg.get("filter_used", True))
+    _refresh_config_cache()
+    return bool(_CFG_CACHE["cfg"].get("filter_used", True))
 
 
 def set_filter_used(flag: bool) -> None:
@@ -262,6 +361,17 @@ STEP_PATTERNS = {
     ],
 }
 
+# Regex única equivalente aos padrões acima, para varrer cada string de
+# tags uma só vez. O prefixo literal "#AK_Step" fica inteiro no início
+# (busca literal rápida no _sre) e re.ASCII evita tabelas Unicode no \d/\s.
+# Grupos: step ("1"/"2"/"3"), ver ("11"/"12"), strict (ID logo após
+# "Step::", formato exigido no v12 de Step 1/2) e o ID do caminho genérico.
+COMBINED_PATTERN = re.compile(
+    r"#AK_Step(?P<step>[123])_v(?P<ver>1[12])::#UWorld::"
+    r"(?:(?=Step::(?P<strict>\d+)))?(?:[^:\s]+::)*(\d+)",
+    re.ASCII,
+)
+
 
 # =========================================================
 # Dialog principal (resultado)
@@ -274,9 +384,9 @@ class UWorldExtractorDialog(QDialog):
         self,
         parent,
         source_label: str,
-        step1_ids: Sequence[str],
-        step2_ids: Sequence[str],
-        step3_ids: Sequence[str],
+        step1_ids: Sequence[int],
+        step2_ids: Sequence[int],
+        step3_ids: Sequence[int],
         filtered_counts: Optional[Dict[str, int]] = None,
     ) -> None:
         super().__init__(parent)
@@ -318,7 +428,7 @@ class UWorldExtractorDialog(QDialog):
 
         self.setLayout(layout)
 
-    def _group(self, step_name: str, ids: Sequence[str]) -> QGroupBox:
+    def _group(self, step_name: str, ids: Sequence[int]) -> QGroupBox:
         group = QGroupBox(step_name)
         lay = QVBoxLayout()
 
@@ -341,7 +451,7 @@ class UWorldExtractorDialog(QDialog):
             )
             lay.addWidget(copy_btn)
 
-            preview = ", ".join(ids[:10])
+            preview = ", ".join(map(str, ids[:10]))
             if len(ids) > 10:
                 preview += f"... (+{len(ids) - 10} more)"
 
@@ -357,9 +467,9 @@ class UWorldExtractorDialog(QDialog):
         group.setLayout(lay)
         return group
 
-    def _copy(self, ids: Sequence[str], step_name: str):
+    def _copy(self, ids: Sequence[int], step_name: str):
         if mw and mw.app:
-            mw.app.clipboard().setText(",".join(ids))
+            mw.app.clipboard().setText(",".join(map(str, ids)))
             tooltip(f"{len(ids)} {step_name} IDs copied to clipboard!")
 
 
@@ -436,12 +546,12 @@ class AnsweredIdsDialog(QDialog):
             return
 
         parts = [p.strip() for p in text.split(",") if p.strip()]
-        new_ids: List[str] = []
+        new_ids: List[int] = []
         invalid: List[str] = []
 
         for p in parts:
-            if p.isdigit():
-                new_ids.append(p)
+            if p.isdecimal():
+                new_ids.append(int(p))
             else:
                 invalid.append(p)
 
@@ -453,7 +563,7 @@ class AnsweredIdsDialog(QDialog):
 
         if new_ids:
             existing_ids = get_answered_ids()
-            all_ids = existing_ids + new_ids
+            all_ids = list(existing_ids) + new_ids
             set_answered_ids(all_ids)
 
             self._update_count_label()
@@ -470,7 +580,7 @@ class AnsweredIdsDialog(QDialog):
             showInfo("No ID saved yet.")
             return
 
-        ids_str = ", ".join(current_ids)
+        ids_str = ", ".join(map(str, current_ids))
         showInfo(f"Saved IDs ({len(current_ids)} total):\n\n{ids_str}")
 
     def on_close(self):
@@ -492,52 +602,99 @@ def open_answered_ids_dialog():
 # Lógica de extração
 # =========================================================
 
-def extract_ids(col: Collection, card_ids: Iterable[int]):
-    """Extrai IDs UWorld dos cards e informa quantos foram filtrados."""
-    s1, s2, s3 = set(), set(), set()
+# Máximo de parâmetros "?" por query (limite do SQLite)
+SQL_CHUNK_SIZE = 900
 
-    for cid in card_ids:
-        try:
-            card = col.get_card(cid)
-            tags = " ".join(card.note().tags)
 
-            for pat in STEP_PATTERNS["step1"]:
-                for m in pat.finditer(tags):
-                    s1.add(m.group(1))
+def _chunks(ids: Sequence[int]) -> Iterator[Sequence[int]]:
+    """Divide a lista de IDs em lotes de até SQL_CHUNK_SIZE."""
+    for start in range(0, len(ids), SQL_CHUNK_SIZE):
+        yield ids[start:start + SQL_CHUNK_SIZE]
 
-            for pat in STEP_PATTERNS["step2"]:
-                for m in pat.finditer(tags):
-                    s2.add(m.group(1))
 
-            for pat in STEP_PATTERNS["step3"]:
-                for m in pat.finditer(tags):
-                    s3.add(m.group(1))
-        except Exception as e:
-            print(f"[UWorld IDs] Error processing card {cid}: {e}")
-            continue
+def _note_ids_for_cards(col: Collection, card_ids: Iterable[int]) -> List[int]:
+    """
+    IDs únicos das notas dos cards. Cards irmãos (cloze, reverso...)
+    compartilham a mesma nota, então as tags são lidas uma vez por nota.
+    """
+    nids = set()
+    for chunk in _chunks(list(card_ids)):
+        placeholders = ",".join("?" * len(chunk))
+        nids.update(
+            col.db.list(f"SELECT DISTINCT nid FROM cards WHERE id IN ({placeholders})", *chunk)
+        )
+    return list(nids)
+
+
+def _iter_tag_strings(col: Collection, card_ids: Iterable[int]) -> Iterator[str]:
+    """
+    Busca direto no banco as tags das notas dos cards, em lotes.
+    Evita criar objetos Card/Note só para ler as tags.
+
+    A coluna notes.tags já é a string crua separada por espaços
+    (" tag1 tag2 "), então vai direto para a regex, sem split/join.
+    """
+    for chunk in _chunks(_note_ids_for_cards(col, card_ids)):
+        placeholders = ",".join("?" * len(chunk))
+        yield from col.db.list(
+            f"SELECT DISTINCT tags FROM notes WHERE id IN ({placeholders})", *chunk
+        )
+
+
+def extract_ids(col: Collection, card_ids: Iterable[int]):
+    """Extrai IDs UWorld dos cards e informa quantos foram filtrados."""
+    # Acumula em listas (append é mais barato que set.add por match);
+    # dedup + ordenação acontecem uma vez só no final.
+    buckets = ([], [], [])
+    # Locais para o loop quente: sem lookup de atributo/global por match
+    append_to = {"1": buckets[0].append, "2": buckets[1].append, "3": buckets[2].append}
+    # findall devolve as tuplas de grupos direto do C, sem objetos Match
+    scan = COMBINED_PATTERN.findall
+
+    # Muitas notas têm exatamente as mesmas tags: cada string única
+    # é varrida pela regex uma só vez (o resultado vai para sets mesmo).
+    seen_tags = set()
+
+    # Erros reais vêm das queries SQL: um único try para o lote todo.
+    # Se algo falhar, loga e segue com os IDs coletados até ali.
+    try:
+        for tags in _iter_tag_strings(col, card_ids):
+            # Checagem barata de substring: notas sem tag UWorld nem
+            # chegam a passar pela regex.
+            if "#UWorld" not in tags:
+                continue
+            if tags in seen_tags:
+                continue
+            seen_tags.add(tags)
+
+            for step, ver, strict, qid in scan(tags):
+                if ver == "12" and step != "3":
+                    # v12 de Step 1/2 só aceita "#UWorld::Step::<id>"
+                    if not strict:
+                        continue
+                    qid = strict
+                append_to[step](qid)
+    except Exception as e:
+        print(f"[UWorld IDs] Error reading card tags: {e}")
 
     # listas "brutas" (sem filtro)
-    raw_s1 = sorted(s1, key=int)
-    raw_s2 = sorted(s2, key=int)
-    raw_s3 = sorted(s3, key=int)
+    # int() só uma vez por string única (não por match), e sort sem key=
+    raw_s1, raw_s2, raw_s3 = (sorted({int(x) for x in set(b)}) for b in buckets)
 
     filtered_counts = {"step1": 0, "step2": 0, "step3": 0}
 
-    if get_filter_used():
-        answered = set(get_answered_ids())
+    answered = _answered_set()
+    if not answered or not get_filter_used():
+        # Sem filtro (ou nada salvo): tudo passa, e nada "filtrado"
+        return raw_s1, raw_s2, raw_s3, filtered_counts
 
-        step1 = [x for x in raw_s1 if x not in answered]
-        step2 = [x for x in raw_s2 if x not in answered]
-        step3 = [x for x in raw_s3 if x not in answered]
+    step1 = [x for x in raw_s1 if x not in answered]
+    step2 = [x for x in raw_s2 if x not in answered]
+    step3 = [x for x in raw_s3 if x not in answered]
 
-        filtered_counts["step1"] = len(raw_s1) - len(step1)
-        filtered_counts["step2"] = len(raw_s2) - len(step2)
-        filtered_counts["step3"] = len(raw_s3) - len(step3)
-    else:
-        # Sem filtro: tudo passa, e nada "filtrado"
-        step1 = raw_s1
-        step2 = raw_s2
-        step3 = raw_s3
+    filtered_counts["step1"] = len(raw_s1) - len(step1)
+    filtered_counts["step2"] = len(raw_s2) - len(step2)
+    filtered_counts["step3"] = len(raw_s3) - len(step3)
 
     return step1, step2, step3, filtered_counts
 
@@ -554,6 +711,12 @@ def run(ids, source, parent=None):
 
     col = mw.col
     step1, step2, step3, filtered_counts = extract_ids(col, ids)
+
+    # nenhum ID (nem mesmo ocultado pelo filtro): não monta o dialog
+    if not (step1 or step2 or step3 or any(filtered_counts.values())):
+        showInfo("No UWorld-tagged cards found.")
+        return
+
     dlg = UWorldExtractorDialog(parent or mw, source, step1, step2, step3, filtered_counts)
     dlg.exec()
 
@@ -619,8 +782,11 @@ def extract_current_deck():
         showInfo(f"Error extracting from current deck: {str(e)}")
 
 
-def browser_selection(browser: Browser):
-    """Extrai IDs da seleção ou busca atual do browser."""
+def browser_selection(browser: Browser, _checked: bool = False):
+    """
+    Extrai IDs da seleção ou busca atual do browser.
+    (_checked recebe o argumento do sinal QAction.triggered e é ignorado)
+    """
     if not mw or not mw.col:
         showInfo("Collection not loaded.")
         return
@@ -664,57 +830,143 @@ def add_tools_menu():
     """Adiciona itens ao menu Tools."""
     act_extract = QAction("📋 Extract UWorld IDs (current deck)", mw)
     act_extract.triggered.connect(extract_current_deck)
-    mw.form.menuTools.addAction(act_extract)
 
     act_cfg = QAction("⚙️ UWorld answered IDs (filter & store)", mw)
     act_cfg.triggered.connect(open_answered_ids_dialog)
-    mw.form.menuTools.addAction(act_cfg)
+
+    # uma única chamada: o menu é atualizado uma vez só
+    mw.form.menuTools.addActions([act_extract, act_cfg])
 
 
 def browser_menu(browser: Browser):
-    """Adiciona item ao menu Edit do browser."""
+    """Adiciona item ao menu Edit do browser (uma vez por browser)."""
+    if browser.property("uworldMenuAdded"):
+        return
+
     act = QAction("Extract UWorld IDs (selection/search)", browser)
-    act.triggered.connect(lambda _, b=browser: browser_selection(b))
+    act.triggered.connect(partial(browser_selection, browser))
     browser.form.menuEdit.addAction(act)
+    browser.setProperty("uworldMenuAdded", True)
 
 
 def browser_context(browser: Browser, menu: QMenu):
-    """Adiciona item ao menu de contexto do browser."""
-    act = QAction("Extract UWorld IDs (selection/search)", browser)
-    act.triggered.connect(lambda _, b=browser: browser_selection(b))
+    """
+    Adiciona item ao menu de contexto do browser.
+    A QAction é criada uma vez por browser e reutilizada em cada menu.
+    """
+    if menu.property("uworldActionAdded"):
+        return
+
+    act = browser.property("uworldContextAction")
+    if act is None:
+        act = QAction("Extract UWorld IDs (selection/search)", browser)
+        act.triggered.connect(partial(browser_selection, browser))
+        browser.setProperty("uworldContextAction", act)
+
     menu.addSeparator()
     menu.addAction(act)
+    menu.setProperty("uworldActionAdded", True)
+
+
+# Placeholders conhecidos do campo de filtro do sidebar (já em minúsculas)
+_SIDEBAR_PLACEHOLDERS = ("sidebar filter", "filtro da barra lateral")
+# Placeholders maiores que isso nem são comparados (evita lower()/strip())
+_SIDEBAR_PLACEHOLDER_MAX_LEN = 32
+# Última tentativa de achar o Sidebar Filter, se nenhum evento resolver antes
+SIDEBAR_SAFETY_NET_MS = 500
+
+
+@lru_cache(maxsize=None)
+def _sidebar_search_bar_class():
+    """
+    Classe SidebarSearchBar do Anki, ou None se ela não existir.
+    Resolvida uma vez só: import que falha não fica em sys.modules.
+    """
+    try:
+        from aqt.browser.sidebar.searchbar import SidebarSearchBar
+    except ImportError:
+        # versões sem o módulo: cai no findChild(QLineEdit)
+        return None
+    return SidebarSearchBar
+
+
+def _is_sidebar_filter(widget) -> bool:
+    """True se o widget é o campo Sidebar Filter (pela classe ou placeholder)."""
+    SidebarSearchBar = _sidebar_search_bar_class()
+    if SidebarSearchBar is not None and isinstance(widget, SidebarSearchBar):
+        return True
+    if not isinstance(widget, QLineEdit):
+        return False
+    try:
+        placeholder = widget.placeholderText()
+    except (AttributeError, RuntimeError):
+        return False
+    if not placeholder or len(placeholder) > _SIDEBAR_PLACEHOLDER_MAX_LEN:
+        return False
+    return placeholder.strip().lower() in _SIDEBAR_PLACEHOLDERS
 
 
 def find_sidebar_filter(browser: Browser) -> Optional[QLineEdit]:
-    """Encontra o campo Sidebar Filter de forma robusta."""
-    for w in browser.findChildren(QLineEdit):
+    """
+    Encontra o campo Sidebar Filter de forma robusta.
+
+    Ordem de busca, da mais barata para a mais cara:
+    1. atributo direto browser.sidebar.searchBar (Anki 2.1.45+);
+    2. findChild pela classe SidebarSearchBar, só dentro do dock do sidebar;
+    3. varredura de todos os QLineEdit do browser pelo placeholder.
+    O resultado é guardado no próprio browser para as próximas chamadas.
+    """
+    # Atributo Python (e não setProperty): guarda o wrapper sip, então dá para
+    # checar sip.isdeleted; uma dynamic property guardaria um QObject* cru.
+    cached = getattr(browser, "_uworld_sidebar_edit", None)
+    if cached is not None:
+        # o widget C++ pode ter sido destruído (sidebar recriado)
+        if not sip.isdeleted(cached):
+            return cached
+        browser._uworld_sidebar_edit = None
+
+    SidebarSearchBar = _sidebar_search_bar_class()
+
+    edit = None
+
+    candidate = getattr(getattr(browser, "sidebar", None), "searchBar", None)
+    if isinstance(candidate, QLineEdit) and not sip.isdeleted(candidate):
+        edit = candidate
+
+    dock = getattr(browser, "sidebarDockWidget", None)
+    if edit is None and dock is not None:
         try:
-            placeholder = w.placeholderText()
-            if placeholder and placeholder.lower().strip() == "sidebar filter":
-                return w
+            edit = dock.findChild(SidebarSearchBar or QLineEdit)
         except (AttributeError, RuntimeError):
-            continue
-    return None
+            edit = None
 
+    if edit is None:
+        for w in browser.findChildren(QLineEdit):
+            if _is_sidebar_filter(w):
+                edit = w
+                break
+
+    if edit is not None:
+        browser._uworld_sidebar_edit = edit
+    return edit
 
-def add_sidebar_button(browser: Browser):
-    """Adiciona botão próximo ao Sidebar Filter."""
-    if getattr(browser, "_uworld_sidebar_button_added", False):
-        return
+
+def add_sidebar_button(browser: Browser) -> bool:
+    """Adiciona botão próximo ao Sidebar Filter. Retorna True se o botão já existe."""
+    if browser.property("uworldBtnAdded"):
+        return True
 
     edit = find_sidebar_filter(browser)
     if not edit:
-        QTimer.singleShot(200, lambda: add_sidebar_button(browser))
-        return
+        return False
 
     parent = edit.parentWidget()
     if not parent:
-        return
+        return False
 
     layout = parent.layout()
     if not layout:
-        return
+        return False
 
     btn = QToolButton(parent)
     btn.setText("Show UWorld Question Ids")
@@ -722,18 +974,142 @@ def add_sidebar_button(browser: Browser):
     btn.clicked.connect(lambda _, b=browser: browser_visible(b))
 
     layout.addWidget(btn)
-    browser._uworld_sidebar_button_added = True
+    browser.setProperty("uworldBtnAdded", True)
+    return True
+
+
+class SidebarButtonInstaller(QObject):
+    """
+    Event filter enquanto o Sidebar Filter ainda não existe.
+
+    Fica no dock do sidebar (e no widget que ele envolve), que é onde o
+    campo é criado; sem dock, no próprio Browser. Só reage quando o filho
+    adicionado/polido é o campo em si: aí guarda o widget e insere o botão,
+    sem varrer a árvore. Widgets novos (containers) passam a ser observados
+    também, já que o campo pode nascer um nível abaixo. Um único timer
+    serve de rede de segurança.
+    """
+
+    EVENTS = (QEvent.Type.ChildAdded, QEvent.Type.ChildPolished)
+
+    def __init__(self, browser: Browser) -> None:
+        super().__init__(browser)
+        self._browser = browser
+        self._done = False
+        self._watched: List[QObject] = []
+
+        dock = getattr(browser, "sidebarDockWidget", None)
+        if dock is not None:
+            self._watch(dock)
+            if dock.widget() is not None:
+                self._watch(dock.widget())
+        else:
+            self._watch(browser)
+
+        QTimer.singleShot(SIDEBAR_SAFETY_NET_MS, self._safety_net)
+
+    def _watch(self, obj: QObject) -> None:
+        if obj not in self._watched:
+            obj.installEventFilter(self)
+            self._watched.append(obj)
+
+    def eventFilter(self, obj, event) -> bool:
+        if self._done or event.type() not in self.EVENTS:
+            return False
+
+        child = event.child()
+        if _is_sidebar_filter(child):
+            self._browser._uworld_sidebar_edit = child
+            if add_sidebar_button(self._browser):
+                self._finish()
+        elif isinstance(child, QWidget):
+            self._watch(child)
+        return False
+
+    def _safety_net(self) -> None:
+        if self._done:
+            return
+        if not add_sidebar_button(self._browser):
+            print("[UWorld IDs] Sidebar filter not found, button not added")
+        self._finish()
+
+    def _finish(self) -> None:
+        self._done = True
+        for obj in self._watched:
+            if not sip.isdeleted(obj):
+                obj.removeEventFilter(self)
+        self._watched = []
 
 
 def on_browser_show(browser: Browser):
     """Hook quando browser é exibido."""
-    QTimer.singleShot(100, lambda: add_sidebar_button(browser))
+    if not add_sidebar_button(browser):
+        SidebarButtonInstaller(browser)
 
 
 # =========================================================
 # Botão na tela inicial (top toolbar, canto superior direito)
 # =========================================================
 
+# JS que insere o botão "Add UW IDs" no canto superior direito da toolbar.
+# Constante de módulo: montada uma vez só, e não a cada redraw.
+_TOOLBAR_JS = r"""
+(function() {
+    var btnId = 'uworld-ids-add-btn';
+    if (document.getElementById(btnId)) {
+        return;
+    }
+
+    // container cacheado entre redraws; só consulta o DOM se ele sumiu
+    var topRight = window.__uwTopRight;
+    if (!topRight || !topRight.isConnected) {
+        topRight = document.querySelector('.top-right, .topbuts, .tdright, .right-tray');
+        window.__uwTopRight = topRight;
+    }
+
+    if (!topRight) {
+        console.log('UWorld IDs: Could not find top-right container');
+        return;
+    }
+
+    var btn = document.createElement('button');
+    btn.id = btnId;
+    btn.textContent = 'Add UW IDs';
+    btn.title = 'Adicionar IDs UWorld já respondidos';
+    btn.style.cssText = `
+        background: transparent;
+        border: 1px solid rgba(255,255,255,0.3);
+        color: var(--fg);
+        padding: 4px 8px;
+        margin: 0 4px;
+        border-radius: 4px;
+        cursor: pointer;
+        font-size: 12px;
+        font-weight: bold;
+        transition: all 0.2s;
+    `;
+    
+    btn.onmouseover = function() {
+        this.style.background = 'rgba(255,255,255,0.1)';
+        this.style.borderColor = 'rgba(255,255,255,0.5)';
+    };
+    
+    btn.onmouseout = function() {
+        this.style.background = 'transparent';
+        this.style.borderColor = 'rgba(255,255,255,0.3)';
+    };
+    
+    btn.onclick = function(e) {
+        e.preventDefault();
+        pycmd('uworld_ids_add');
+        return false;
+    };
+
+    topRight.insertBefore(btn, topRight.firstChild);
+})();
+"""
+
+
 def on_top_toolbar_redraw(toolbar):
     """
     Adiciona um botão na área superior direita da home do Anki
@@ -746,72 +1122,22 @@ def on_top_toolbar_redraw(toolbar):
 
     toolbar.link_handlers["uworld_ids_add"] = _handler
 
-    js = r"""
-    (function() {
-        var btnId = 'uworld-ids-add-btn';
-        if (document.getElementById(btnId)) {
-            return;
-        }
-
-        var topRight = document.querySelector('.top-right') || 
-                       document.querySelector('.topbuts') ||
-                       document.querySelector('.tdright');
-        
-        if (!topRight) {
-            var allDivs = document.querySelectorAll('div');
-            for (var i = 0; i < allDivs.length; i++) {
-                var d = allDivs[i];
-                if (d.style.float === 'right' || 
-                    d.align === 'right' ||
-                    (d.className && d.className.indexOf('right') !== -1)) {
-                    topRight = d;
-                    break;
-                }
-            }
-        }
-
-        if (!topRight) {
-            console.log('UWorld IDs: Could not find top-right container');
-            return;
-        }
-
-        var btn = document.createElement('button');
-        btn.id = btnId;
-        btn.textContent = 'Add UW IDs';
-        btn.title = 'Adicionar IDs UWorld já respondidos';
-        btn.style.cssText = `
-            background: transparent;
-            border: 1px solid rgba(255,255,255,0.3);
-            color: var(--fg);
-            padding: 4px 8px;
-            margin: 0 4px;
-            border-radius: 4px;
-            cursor: pointer;
-            font-size: 12px;
-            font-weight: bold;
-            transition: all 0.2s;
-        `;
-        
-        btn.onmouseover = function() {
-            this.style.background = 'rgba(255,255,255,0.1)';
-            this.style.borderColor = 'rgba(255,255,255,0.5)';
-        };
-        
-        btn.onmouseout = function() {
-            this.style.background = 'transparent';
-            this.style.borderColor = 'rgba(255,255,255,0.3)';
-        };
-        
-        btn.onclick = function(e) {
-            e.preventDefault();
-            pycmd('uworld_ids_add');
-            return false;
-        };
-
-        topRight.insertBefore(btn, topRight.firstChild);
-    })();
+    # Botão já injetado nesta mesma webview: evita o eval a cada redraw.
+    # (o flag é limpo por on_top_toolbar_init_links quando o HTML é recriado)
+    injected_web = getattr(toolbar, "_uworld_btn_web", None)
+    if injected_web is not None and injected_web() is toolbar.web:
+        return
+
+    toolbar.web.eval(_TOOLBAR_JS)
+    toolbar._uworld_btn_web = weakref.ref(toolbar.web)
+
+
+def on_top_toolbar_init_links(links, toolbar):
+    """
+    Hook chamado quando a toolbar monta o HTML de novo (toolbar.draw):
+    o botão some junto com o DOM antigo, então libera uma nova injeção.
     """
-    toolbar.web.eval(js)
+    toolbar._uworld_btn_web = None
 
 
 # =========================================================
@@ -822,12 +1148,16 @@ def init_addon():
     """Inicializa o addon."""
     try:
         add_tools_menu()
+        gui_hooks.top_toolbar_did_init_links.append(on_top_toolbar_init_links)
         gui_hooks.top_toolbar_did_redraw.append(on_top_toolbar_redraw)
         gui_hooks.browser_menus_did_init.append(browser_menu)
         gui_hooks.browser_will_show_context_menu.append(browser_context)
         gui_hooks.browser_will_show.append(on_browser_show)
-        print("[UWorld IDs] Add-on initialized successfully")
-        print("[UWorld IDs] Config path:", _config_path())
+        # logs de inicialização só com UWORLD_IDS_DEBUG definido:
+        # nada de I/O (stdout/caminho da config) no startup normal do Anki
+        if os.environ.get("UWORLD_IDS_DEBUG"):
+            print("[UWorld IDs] Add-on initialized successfully")
+            print("[UWorld IDs] Config path:", _config_path())
     except Exception as e:
         print(f"[UWorld IDs] Error initializing addon: {e}")
 